@@ -2,16 +2,44 @@ import os
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
 from pydantic import BaseModel, Field
 from bson import ObjectId
+from pymongo import InsertOne
 import hashlib
 import secrets
+import time
 
-from database import db, create_document, get_documents
+import jwt
+from passlib.hash import argon2
+from redis import asyncio as aioredis
 
-app = FastAPI(title="Student Management System API")
+from database import db, report_db, create_document, get_documents
+
+app = FastAPI(title="Student Management System API", default_response_class=ORJSONResponse)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+redis = aioredis.Redis(connection_pool=aioredis.ConnectionPool.from_url(
+    REDIS_URL, max_connections=20, decode_responses=True))
+
+JWT_SECRET = os.getenv("JWT_SECRET", "change-me")
+JWT_ALGORITHM = "HS256"
+SESSION_TTL = timedelta(days=7)
+
+
+@app.on_event("startup")
+async def create_indexes():
+    if db is None:
+        return
+    await db["student"].create_index("email", unique=True)
+    await db["course"].create_index("code", unique=True)
+    await db["enrollment"].create_index([("student_id", 1), ("course_id", 1)], unique=True)
+    await db["attendance"].create_index([("student_id", 1), ("course_id", 1), ("date", -1)])
+    await db["grade"].create_index([("student_id", 1), ("course_id", 1), ("graded_at", -1)])
+    await db["announcement"].create_index([("course_id", 1), ("created_at", -1)])
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,14 +53,55 @@ app.add_middleware(
 # Utility functions
 
 def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+    return argon2.hash(password)
+
+
+def stream_json_array(cursor) -> StreamingResponse:
+    """Emit documents as a JSON array while the cursor batches arrive,
+    keeping memory constant instead of materializing the full list."""
+    async def gen():
+        yield b"["
+        first = True
+        async for doc in cursor:
+            if not first:
+                yield b","
+            first = False
+            doc["_id"] = str(doc["_id"])
+            yield orjson.dumps(doc)
+        yield b"]"
+    return StreamingResponse(gen(), media_type="application/json")
+
+
+async def cached_json_body(key: str, ttl: int, loader) -> str:
+    """Fetch a JSON payload from Redis, filling the cache via loader() on miss."""
+    body = await redis.get(key)
+    if body is None:
+        # orjson walks the documents in C; default=str covers ObjectId
+        body = orjson.dumps(await loader(), default=str).decode()
+        await redis.setex(key, ttl, body)
+    return body
+
+
+def conditional_json_response(body: str, ttl: int, if_none_match: Optional[str] = None) -> Response:
+    etag = hashlib.sha1(body.encode()).hexdigest()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={ttl}, stale-while-revalidate={ttl // 2}",
+    }
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def cached_json_response(key: str, ttl: int, loader, if_none_match: Optional[str] = None) -> Response:
+    return conditional_json_response(await cached_json_body(key, ttl, loader), ttl, if_none_match)
 
 
 def to_object_id(id_str: str) -> ObjectId:
-    try:
-        return ObjectId(id_str)
-    except Exception:
+    # O(1) hex check up front; the exception path is slow and these run per id
+    if not ObjectId.is_valid(id_str):
         raise HTTPException(status_code=400, detail="Invalid id format")
+    return ObjectId(id_str)
 
 
 # Auth models
@@ -53,19 +122,33 @@ class SessionInfo(BaseModel):
 
 
 # Auth helpers
+def create_access_token(user: dict) -> str:
+    now = datetime.now(timezone.utc)
+    payload = {
+        "sub": user["_id"],
+        "name": user["name"],
+        "email": user["email"],
+        "role": user["role"],
+        "jti": secrets.token_hex(8),
+        "iat": now,
+        "exp": now + SESSION_TTL,
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
 async def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization header")
     token = authorization.replace("Bearer ", "").strip()
-    session = db["session"].find_one({"token": token})
-    if not session:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    if session.get("expires_at") and session["expires_at"] < datetime.now(timezone.utc):
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    user = db["student"].find_one({"_id": session["user_id"]})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    return {"_id": str(user["_id"]), "name": user["name"], "email": user["email"], "role": user.get("role", "student")}
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if await redis.sismember("jwt:revoked", payload["jti"]):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return {"_id": payload["sub"], "name": payload["name"], "email": payload["email"], "role": payload["role"]}
 
 
 @app.get("/")
@@ -74,7 +157,7 @@ def read_root():
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     resp = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -88,7 +171,7 @@ def test_database():
             resp["database"] = "✅ Available"
             resp["database_name"] = getattr(db, "name", "✅ Connected")
             try:
-                resp["collections"] = db.list_collection_names()[:10]
+                resp["collections"] = (await db.list_collection_names())[:10]
                 resp["database"] = "✅ Connected & Working"
                 resp["connection_status"] = "Connected"
             except Exception as e:
@@ -104,9 +187,7 @@ def test_database():
 
 # Auth routes
 @app.post("/auth/register", response_model=SessionInfo)
-def register(payload: RegisterRequest):
-    if db["student"].find_one({"email": payload.email}):
-        raise HTTPException(status_code=400, detail="Email already registered")
+async def register(payload: RegisterRequest):
     student = {
         "name": payload.name,
         "email": payload.email,
@@ -116,35 +197,27 @@ def register(payload: RegisterRequest):
         "created_at": datetime.now(timezone.utc),
         "updated_at": datetime.now(timezone.utc),
     }
-    res = db["student"].insert_one(student)
-    user_id = res.inserted_id
-
-    token = secrets.token_urlsafe(32)
-    session = {
-        "user_id": user_id,
-        "token": token,
-        "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-        "created_at": datetime.now(timezone.utc),
-    }
-    db["session"].insert_one(session)
+    # Duplicate check and insert in one atomic round trip
+    res = await db["student"].update_one({"email": payload.email}, {"$setOnInsert": student}, upsert=True)
+    if res.upserted_id is None:
+        raise HTTPException(status_code=400, detail="Email already registered")
 
-    return {"token": token, "user": {"_id": str(user_id), "name": student["name"], "email": student["email"], "role": "student"}}
+    current = {"_id": str(res.upserted_id), "name": student["name"], "email": student["email"], "role": "student"}
+    return {"token": create_access_token(current), "user": current}
 
 
 @app.post("/auth/login", response_model=SessionInfo)
-def login(payload: LoginRequest):
-    user = db["student"].find_one({"email": payload.email})
-    if not user or user.get("password_hash") != hash_password(payload.password):
+async def login(payload: LoginRequest):
+    user = await db["student"].find_one({"email": payload.email}, {"password_hash": 1, "name": 1, "email": 1, "role": 1})
+    try:
+        # Legacy sha256 hashes from before the argon2 migration fail identify/verify
+        verified = bool(user and user.get("password_hash")) and argon2.verify(payload.password, user["password_hash"])
+    except ValueError:
+        verified = False
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = secrets.token_urlsafe(32)
-    session = {
-        "user_id": user["_id"],
-        "token": token,
-        "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-        "created_at": datetime.now(timezone.utc),
-    }
-    db["session"].insert_one(session)
-    return {"token": token, "user": {"_id": str(user["_id"]), "name": user["name"], "email": user["email"], "role": user.get("role", "student")}}
+    current = {"_id": str(user["_id"]), "name": user["name"], "email": user["email"], "role": user.get("role", "student")}
+    return {"token": create_access_token(current), "user": current}
 
 
 # Courses
@@ -156,25 +229,40 @@ class CourseCreate(BaseModel):
     capacity: Optional[int] = 100
 
 
+# Fields the frontend actually renders, used as query projections
+COURSE_PROJECTION = {"code": 1, "title": 1, "description": 1, "instructor": 1, "capacity": 1, "created_at": 1}
+
+# L1 tier for the catalog: per-process, keyed by 5s time bucket, in front of Redis
+COURSES_L1_TTL = 5
+_courses_l1: dict = {}
+
+
 @app.post("/courses")
-def create_course(payload: CourseCreate, user=Depends(get_current_user)):
+async def create_course(payload: CourseCreate, user=Depends(get_current_user)):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can create courses")
-    if db["course"].find_one({"code": payload.code}):
+    if await db["course"].find_one({"code": payload.code}):
         raise HTTPException(status_code=400, detail="Course code exists")
     course = payload.model_dump()
     course.update({"created_at": datetime.now(timezone.utc), "updated_at": datetime.now(timezone.utc)})
-    res = db["course"].insert_one(course)
+    res = await db["course"].insert_one(course)
     course["_id"] = str(res.inserted_id)
+    _courses_l1.clear()
+    await redis.delete("courses:all")
     return course
 
 
 @app.get("/courses")
-def list_courses():
-    items = list(db["course"].find())
-    for it in items:
-        it["_id"] = str(it["_id"])
-    return items
+async def list_courses(if_none_match: Optional[str] = Header(None)):
+    async def load():
+        return await db["course"].find({}, COURSE_PROJECTION).to_list(None)
+    bucket = int(time.time()) // COURSES_L1_TTL
+    body = _courses_l1.get(bucket)
+    if body is None:
+        body = await cached_json_body("courses:all", 60, load)
+        _courses_l1.clear()
+        _courses_l1[bucket] = body
+    return conditional_json_response(body, 60, if_none_match)
 
 
 # Enrollment
@@ -183,31 +271,25 @@ class EnrollmentRequest(BaseModel):
 
 
 @app.post("/enroll")
-def enroll_course(payload: EnrollmentRequest, user=Depends(get_current_user)):
-    course = db["course"].find_one({"_id": to_object_id(payload.course_id)})
+async def enroll_course(payload: EnrollmentRequest, user=Depends(get_current_user)):
+    course = await db["course"].find_one({"_id": to_object_id(payload.course_id)}, {"_id": 1})
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
-    exists = db["enrollment"].find_one({"student_id": user["_id"], "course_id": payload.course_id})
-    if exists:
+    res = await db["enrollment"].update_one(
+        {"student_id": user["_id"], "course_id": payload.course_id},
+        {"$setOnInsert": {"status": "enrolled", "enrolled_at": datetime.now(timezone.utc)}},
+        upsert=True)
+    if res.upserted_id is None:
         raise HTTPException(status_code=400, detail="Already enrolled")
-    enrollment = {
-        "student_id": user["_id"],
-        "course_id": payload.course_id,
-        "status": "enrolled",
-        "enrolled_at": datetime.now(timezone.utc),
-    }
-    db["enrollment"].insert_one(enrollment)
     return {"message": "Enrolled successfully"}
 
 
 @app.get("/my/courses")
-def my_courses(user=Depends(get_current_user)):
-    enrolls = list(db["enrollment"].find({"student_id": user["_id"]}))
+async def my_courses(user=Depends(get_current_user)):
+    enrolls = await db["enrollment"].find({"student_id": user["_id"]}, {"course_id": 1}).to_list(None)
     course_ids = [to_object_id(e["course_id"]) for e in enrolls]
-    courses = list(db["course"].find({"_id": {"$in": course_ids}})) if course_ids else []
-    for c in courses:
-        c["_id"] = str(c["_id"]) 
-    return courses
+    courses = await db["course"].find({"_id": {"$in": course_ids}}, COURSE_PROJECTION).to_list(None) if course_ids else []
+    return Response(orjson.dumps(courses, default=str), media_type="application/json")
 
 
 # Attendance
@@ -217,8 +299,8 @@ class AttendanceMarkRequest(BaseModel):
 
 
 @app.post("/attendance/mark")
-def mark_attendance(payload: AttendanceMarkRequest, user=Depends(get_current_user)):
-    enrollment = db["enrollment"].find_one({"student_id": user["_id"], "course_id": payload.course_id})
+async def mark_attendance(payload: AttendanceMarkRequest, user=Depends(get_current_user)):
+    enrollment = await db["enrollment"].find_one({"student_id": user["_id"], "course_id": payload.course_id})
     if not enrollment:
         raise HTTPException(status_code=400, detail="Not enrolled in the course")
     record = {
@@ -227,16 +309,37 @@ def mark_attendance(payload: AttendanceMarkRequest, user=Depends(get_current_use
         "date": datetime.now(timezone.utc),
         "status": payload.status,
     }
-    db["attendance"].insert_one(record)
+    await db["attendance"].insert_one(record)
     return {"message": "Attendance marked"}
 
 
+@app.post("/attendance/mark_bulk")
+async def mark_attendance_bulk(payload: List[AttendanceMarkRequest], user=Depends(get_current_user)):
+    if not payload:
+        return {"message": "Nothing to mark", "inserted": 0}
+    course_ids = {p.course_id for p in payload}
+    enrolled = {e["course_id"] for e in await db["enrollment"].find(
+        {"student_id": user["_id"], "course_id": {"$in": list(course_ids)}}, {"course_id": 1}).to_list(None)}
+    missing = course_ids - enrolled
+    if missing:
+        raise HTTPException(status_code=400, detail="Not enrolled in courses: " + ", ".join(sorted(missing)))
+    now = datetime.now(timezone.utc)
+    ops = [InsertOne({
+        "student_id": user["_id"],
+        "course_id": p.course_id,
+        "date": now,
+        "status": p.status,
+    }) for p in payload]
+    res = await db["attendance"].bulk_write(ops, ordered=False)
+    return {"message": "Attendance marked", "inserted": res.inserted_count}
+
+
 @app.get("/attendance/{course_id}")
-def get_attendance(course_id: str, user=Depends(get_current_user)):
-    items = list(db["attendance"].find({"student_id": user["_id"], "course_id": course_id}))
-    for it in items:
-        it["_id"] = str(it["_id"])
-    return items
+async def get_attendance(course_id: str, user=Depends(get_current_user)):
+    cursor = db["attendance"].find(
+        {"student_id": user["_id"], "course_id": course_id},
+        {"course_id": 1, "date": 1, "status": 1}).batch_size(200)
+    return stream_json_array(cursor)
 
 
 # Grades
@@ -247,9 +350,9 @@ class GradeCreate(BaseModel):
 
 
 @app.post("/grades")
-def add_grade(payload: GradeCreate, user=Depends(get_current_user)):
+async def add_grade(payload: GradeCreate, user=Depends(get_current_user)):
     # For demo, allow students to add their own grades. In real app, restrict to instructor/admin.
-    enrollment = db["enrollment"].find_one({"student_id": user["_id"], "course_id": payload.course_id})
+    enrollment = await db["enrollment"].find_one({"student_id": user["_id"], "course_id": payload.course_id})
     if not enrollment:
         raise HTTPException(status_code=400, detail="Not enrolled in the course")
     item = {
@@ -259,16 +362,38 @@ def add_grade(payload: GradeCreate, user=Depends(get_current_user)):
         "label": payload.label,
         "graded_at": datetime.now(timezone.utc),
     }
-    db["grade"].insert_one(item)
+    await db["grade"].insert_one(item)
     return {"message": "Grade added"}
 
 
+@app.post("/grades/bulk")
+async def add_grades_bulk(payload: List[GradeCreate], user=Depends(get_current_user)):
+    if not payload:
+        return {"message": "Nothing to add", "inserted": 0}
+    course_ids = {p.course_id for p in payload}
+    enrolled = {e["course_id"] for e in await db["enrollment"].find(
+        {"student_id": user["_id"], "course_id": {"$in": list(course_ids)}}, {"course_id": 1}).to_list(None)}
+    missing = course_ids - enrolled
+    if missing:
+        raise HTTPException(status_code=400, detail="Not enrolled in courses: " + ", ".join(sorted(missing)))
+    now = datetime.now(timezone.utc)
+    ops = [InsertOne({
+        "student_id": user["_id"],
+        "course_id": p.course_id,
+        "grade": p.grade,
+        "label": p.label,
+        "graded_at": now,
+    }) for p in payload]
+    res = await db["grade"].bulk_write(ops, ordered=False)
+    return {"message": "Grades added", "inserted": res.inserted_count}
+
+
 @app.get("/grades/{course_id}")
-def get_grades(course_id: str, user=Depends(get_current_user)):
-    items = list(db["grade"].find({"student_id": user["_id"], "course_id": course_id}))
-    for it in items:
-        it["_id"] = str(it["_id"])
-    return items
+async def get_grades(course_id: str, user=Depends(get_current_user)):
+    cursor = db["grade"].find(
+        {"student_id": user["_id"], "course_id": course_id},
+        {"course_id": 1, "grade": 1, "label": 1, "graded_at": 1}).batch_size(200)
+    return stream_json_array(cursor)
 
 
 # Extra features: announcements and progress
@@ -279,9 +404,9 @@ class AnnouncementCreate(BaseModel):
 
 
 @app.post("/announcements")
-def create_announcement(payload: AnnouncementCreate, user=Depends(get_current_user)):
+async def create_announcement(payload: AnnouncementCreate, user=Depends(get_current_user)):
     # Allow admin/instructor only in real app. Here allow all enrolled students for demo.
-    course = db["course"].find_one({"_id": to_object_id(payload.course_id)})
+    course = await db["course"].find_one({"_id": to_object_id(payload.course_id)})
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     item = {
@@ -291,41 +416,83 @@ def create_announcement(payload: AnnouncementCreate, user=Depends(get_current_us
         "created_by": user["_id"],
         "created_at": datetime.now(timezone.utc),
     }
-    db["announcement"].insert_one(item)
+    await db["announcement"].insert_one(item)
+    await redis.delete(f"ann:{payload.course_id}")
     return {"message": "Announcement posted"}
 
 
 @app.get("/announcements/{course_id}")
-def list_announcements(course_id: str, user=Depends(get_current_user)):
-    items = list(db["announcement"].find({"course_id": course_id}).sort("created_at", -1))
-    for it in items:
-        it["_id"] = str(it["_id"])
-    return items
+async def list_announcements(course_id: str, user=Depends(get_current_user),
+                             if_none_match: Optional[str] = Header(None)):
+    async def load():
+        return await db["announcement"].find(
+            {"course_id": course_id},
+            {"title": 1, "content": 1, "created_by": 1, "created_at": 1}).sort("created_at", -1).to_list(None)
+    return await cached_json_response(f"ann:{course_id}", 60, load, if_none_match)
 
 
 @app.get("/dashboard")
-def dashboard(user=Depends(get_current_user)):
-    enrolls = list(db["enrollment"].find({"student_id": user["_id"]}))
-    course_ids = [to_object_id(e["course_id"]) for e in enrolls]
-    courses = list(db["course"].find({"_id": {"$in": course_ids}})) if course_ids else []
+async def dashboard(user=Depends(get_current_user)):
+    enrolls = await db["enrollment"].find({"student_id": user["_id"]}, {"course_id": 1}).to_list(None)
+    cid_strs = [e["course_id"] for e in enrolls]
+    course_ids = [to_object_id(c) for c in cid_strs]
+    courses = await db["course"].find({"_id": {"$in": course_ids}}, COURSE_PROJECTION).to_list(None) if course_ids else []
     for c in courses:
-        c["_id"] = str(c["_id"]) 
-
-    # Calculate simple progress stats
+        c["_id"] = str(c["_id"])
+
+    # Per-course stats computed server-side, both collections in one round trip
+    stats_pipeline = [
+        {"$match": {"student_id": user["_id"], "course_id": {"$in": cid_strs}}},
+        {"$group": {"_id": "$course_id", "n": {"$sum": 1}}},
+        {"$set": {"kind": "attendance"}},
+        {"$unionWith": {"coll": "grade", "pipeline": [
+            {"$match": {"student_id": user["_id"], "course_id": {"$in": cid_strs}}},
+            {"$group": {"_id": "$course_id", "avg": {"$avg": "$grade"}, "n": {"$sum": 1}}},
+            {"$set": {"kind": "grade"}},
+        ]}},
+    ]
+    att_counts = {}
+    grade_stats = {}
+    async for r in report_db["attendance"].aggregate(stats_pipeline):
+        if r["kind"] == "attendance":
+            att_counts[r["_id"]] = r["n"]
+        else:
+            grade_stats[r["_id"]] = r
     progress = []
     for c in courses:
-        att_count = db["attendance"].count_documents({"student_id": user["_id"], "course_id": c["_id"]})
-        grade_docs = list(db["grade"].find({"student_id": user["_id"], "course_id": c["_id"]}))
-        avg_grade = sum([g.get("grade", 0) for g in grade_docs]) / max(len(grade_docs), 1)
+        stats = grade_stats.get(c["_id"])
         progress.append({
             "course": c,
-            "attendance_records": att_count,
-            "avg_grade": avg_grade,
+            "attendance_records": att_counts.get(c["_id"], 0),
+            "avg_grade": stats["avg"] if stats else 0,
         })
 
     return {"user": user, "courses": courses, "progress": progress}
 
 
+# Demo seed
+@app.post("/seed")
+async def seed():
+    if await db["course"].count_documents({}) > 0:
+        return {"message": "Already seeded"}
+    now = datetime.now(timezone.utc)
+    demo_courses = [
+        {"code": "CS101", "title": "Intro to Programming", "description": "Learn Python basics",
+         "instructor": "Dr. Ada", "capacity": 100, "created_at": now, "updated_at": now},
+        {"code": "CS201", "title": "Data Structures", "description": "Arrays, Trees, Graphs",
+         "instructor": "Dr. Knuth", "capacity": 100, "created_at": now, "updated_at": now},
+        {"code": "CS301", "title": "Databases", "description": "SQL/NoSQL fundamentals",
+         "instructor": "Dr. Codd", "capacity": 100, "created_at": now, "updated_at": now},
+    ]
+    await db["course"].insert_many(demo_courses)
+    return {"message": "Seeded", "count": len(demo_courses)}
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "time": datetime.now(timezone.utc).isoformat()}
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))